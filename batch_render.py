@@ -0,0 +1,273 @@
+import os
+import io
+import csv
+import copy
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from docx import Document
+from docx.document import Document as DocumentObject
+import instrumentation
+from instrumentation import span, count, log
+from docx_utils import populate_table_0, compile_label_index, estimate_rows_per_page, stream_rows_into_table
+from render_cache import RenderCache, render_key
+
+
+# Per-process template state, set up once by _init_worker
+_template = None
+_fill = None
+
+
+class DocumentTemplate:
+    """
+    A .docx template parsed once and cloned per record.
+
+    Every call to new_document() returns a fresh Document built on a deep copy of
+    the pristine document element, sharing the already-loaded package (styles,
+    numbering, media). Relationships added while filling a clone (e.g. signature
+    images) are dropped again by reset(), so clones never leak into each other.
+    """
+
+    def __init__(self, source):
+        """
+        :param source: Path to the template .docx or its raw bytes.
+        """
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        with span("parse", operation="template"):
+            self._doc = Document(source)
+        self._part = self._doc.part
+        self._pristine = copy.deepcopy(self._part.element)
+        self._rels = dict(self._part.rels)
+        self._rel_targets = dict(self._part.rels.related_parts)
+        self._label_indexes = {}
+
+    def new_document(self):
+        """
+        Return a fresh Document whose body is a clone of the template's.
+        """
+        self.reset()
+        element = copy.deepcopy(self._pristine)
+        self._part._element = element
+        return DocumentObject(element, self._part)
+
+    def label_index(self, labels, table_index=0):
+        """
+        Return the compile_label_index result for `labels` in the given table of the
+        template, compiling it on first use. The positions describe the pristine template,
+        so only use them on a clone whose table has not been changed since new_document().
+        """
+        key = (table_index, frozenset(labels))
+        label_index = self._label_indexes.get(key)
+        if label_index is None:
+            label_index = compile_label_index(self._doc.tables[table_index], labels)
+            self._label_indexes[key] = label_index
+        return label_index
+
+    def reset(self):
+        """
+        Drop any relationships added to the document part since the template was loaded.
+        """
+        rels = self._part.rels
+        for rId in list(rels):
+            if rId not in self._rels:
+                del rels[rId]
+                rels.related_parts.pop(rId, None)
+        rels.update(self._rels)
+        rels.related_parts.update(self._rel_targets)
+
+
+def fill_record(doc, record, table_index=0):
+    """
+    Default fill: write the record's values next to the matching labels in the given table,
+    using the worker template's precompiled label positions.
+    :param doc: The Document cloned from the template.
+    :param record: Mapping of label text (e.g. "Tender Ref.:") to value.
+    :param table_index: Index of the label/value table.
+    """
+    label_index = _template.label_index(record, table_index) if _template is not None else None
+    populate_table_0(doc.tables[table_index], record, label_index)
+
+
+def load_records_from_csv(csv_file):
+    """
+    Yield one record (dict) per CSV row; the header row supplies the labels.
+    """
+    with open(csv_file, newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            yield row
+
+
+def _init_worker(template_bytes, fill):
+    """
+    Process pool initializer: parse the template once per worker. Counters inherited
+    from the parent on fork are dropped, so each record reports only its own work.
+    """
+    global _template, _fill
+    instrumentation.recorder.reset()
+    _template = DocumentTemplate(template_bytes)
+    _fill = fill
+
+
+def _render_one(job):
+    """
+    Render a single (record, output path) job with the worker's template.
+    """
+    record, output_path = job
+    with span("clone"):
+        doc = _template.new_document()
+    with span("fill"):
+        _fill(doc, record)
+    with span("save"):
+        doc.save(output_path)
+    count("bytes_written", os.path.getsize(output_path))
+    return output_path, instrumentation.recorder.drain()
+
+
+def render_batch(template_docx, records, output_dir, fill=fill_record,
+                 name_pattern="output_{index:05d}.docx", max_workers=None, chunksize=16, cache=None):
+    """
+    Render one document per record from a single template across a process pool.
+    :param template_docx: Path to the template .docx file; it is read from disk once.
+    :param records: Iterable of records passed to `fill`.
+    :param output_dir: Directory the documents are written to.
+    :param fill: Picklable callable fill(doc, record) applied to each cloned document.
+    :param name_pattern: Output file name pattern, formatted with the record's `index`.
+    :param max_workers: Number of worker processes; 0 renders in the current process.
+    :param chunksize: Number of records sent to a worker at a time.
+    :param cache: Optional RenderCache; records already rendered from the same template
+                  with the same fill are copied from it instead of being rendered.
+    :return: List of output paths, in record order.
+    """
+    with open(template_docx, 'rb') as f:
+        template_bytes = f.read()
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = (
+        (record, os.path.join(output_dir, name_pattern.format(index=index)))
+        for index, record in enumerate(records)
+    )
+    cache_keys = {}
+    if cache is not None:
+        fill_name = f"{fill.__module__}.{fill.__qualname__}"
+        jobs = _uncached_jobs(jobs, template_docx, fill_name, cache, cache_keys)
+
+    start = time.perf_counter()
+    if max_workers == 0:
+        jobs = list(jobs)  # Do the cache lookups before any record is rendered
+        parent = instrumentation.recorder.drain()
+        _init_worker(template_bytes, fill)
+        rendered = [_render_one(job) for job in jobs]
+        instrumentation.recorder.merge(parent)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(template_bytes, fill)) as executor:
+            rendered = list(executor.map(_render_one, jobs, chunksize=chunksize))
+
+    # Fold each record's stage timings and counters into this process's recorder
+    for output_path, summary in rendered:
+        instrumentation.recorder.merge(summary)
+        if output_path in cache_keys:
+            cache.store(cache_keys[output_path], ".docx", output_path)
+    # cache_keys holds every output path in record order, cached or not
+    output_paths = list(cache_keys) if cache is not None else [output_path for output_path, _ in rendered]
+    log(f"Rendered {len(rendered)} of {len(output_paths)} documents to {output_dir} "
+          f"in {time.perf_counter() - start:.2f}s")
+    return output_paths
+
+
+def _uncached_jobs(jobs, template_docx, fill_name, cache, cache_keys):
+    """
+    Yield only the jobs whose output is not in the cache, copying cached outputs into
+    place and recording every job's cache key in `cache_keys` by output path.
+    """
+    for record, output_path in jobs:
+        key = render_key(template_docx, {"fill": fill_name, "record": record})
+        cache_keys[output_path] = key
+        if not cache.fetch(key, ".docx", output_path):
+            yield record, output_path
+
+
+def split_csv_into_documents(template_docx, csv_file, output_pattern, table_index=1,
+                             rows_per_document=None, max_pages=None, batch_size=1000):
+    """
+    Stream a CSV into a template table, rolling over to a fresh copy of the template
+    whenever a document is full. Each part is saved as soon as it is complete, so only
+    one document is held in memory at a time.
+    :param template_docx: Path to the template .docx file.
+    :param csv_file: CSV whose data rows are written to the table by column position.
+    :param output_pattern: Output path pattern, formatted with the 1-based `part` number
+                           (e.g. "out/tenders_{part:03d}.docx").
+    :param table_index: Index of the table to fill.
+    :param rows_per_document: Maximum CSV rows per document.
+    :param max_pages: Maximum pages per document, converted to rows with
+                      estimate_rows_per_page(); the smaller of the two limits applies.
+    :param batch_size: Number of appended rows inserted into the table at a time.
+    :return: List of output paths, in order.
+    """
+    template = DocumentTemplate(template_docx)
+    limit = rows_per_document
+    if max_pages is not None:
+        by_pages = max_pages * estimate_rows_per_page(template.new_document(), table_index)
+        limit = min(limit, by_pages) if limit else by_pages
+    if not limit or limit < 1:
+        raise ValueError("rows_per_document or max_pages must be a positive number")
+
+    output_paths = []
+    start = time.perf_counter()
+    with open(csv_file, newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)  # Skip the header row; columns are matched by position
+        first = next(reader, None)
+        while True:
+            rows = itertools.chain([first], itertools.islice(reader, limit - 1)) if first else ()
+            output_path = output_pattern.format(part=len(output_paths) + 1)
+            with span("clone"):
+                doc = template.new_document()
+            with span("fill", operation="split_csv_into_documents"):
+                stream_rows_into_table(doc.tables[table_index], rows, batch_size)
+            output_dir = os.path.dirname(output_path)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+            with span("save"):
+                doc.save(output_path)
+            count("bytes_written", os.path.getsize(output_path))
+            count("documents_written")
+            output_paths.append(output_path)
+            log(f"Saved {output_path}")
+            first = next(reader, None)
+            if first is None:
+                break
+    log(f"Split {csv_file} into {len(output_paths)} documents "
+        f"in {time.perf_counter() - start:.2f}s")
+    return output_paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render one document per CSV record from a template.")
+    parser.add_argument("template", help="Template .docx file")
+    parser.add_argument("records", help="CSV file whose headers are the Table 0 labels")
+    parser.add_argument("output_dir", help="Directory for the rendered documents")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (0 = in-process)")
+    parser.add_argument("--chunksize", type=int, default=16, help="Records per worker task")
+    parser.add_argument("--cache-dir", help="Reuse unchanged documents from this render cache")
+    parser.add_argument("--split-table", type=int, metavar="INDEX",
+                        help="Instead, stream the CSV rows into this table, split across documents")
+    parser.add_argument("--rows-per-document", type=int, help="Row limit per document (with --split-table)")
+    parser.add_argument("--max-pages", type=int, help="Estimated page limit per document (with --split-table)")
+    parser.add_argument("--verbose", action="store_true", help="Print progress messages")
+    parser.add_argument("--metrics", help="Append stage totals and counters to this JSONL file")
+    args = parser.parse_args()
+
+    instrumentation.set_verbose(args.verbose)
+    if args.split_table is not None:
+        pattern = os.path.join(args.output_dir, "part_{part:03d}.docx")
+        split_csv_into_documents(args.template, args.records, pattern, args.split_table,
+                                 args.rows_per_document, args.max_pages)
+    else:
+        render_batch(args.template, load_records_from_csv(args.records), args.output_dir,
+                     max_workers=args.workers, chunksize=args.chunksize,
+                     cache=RenderCache(args.cache_dir) if args.cache_dir else None)
+    if args.metrics:
+        instrumentation.recorder.export_jsonl(args.metrics, command="batch_render")
@@ -0,0 +1,382 @@
+import os
+import io
+import csv
+import sys
+import json
+import time
+import shutil
+import argparse
+import importlib
+import platform
+import tempfile
+import contextlib
+import multiprocessing
+from datetime import datetime, timezone
+
+import docx_utils
+
+DEFAULT_TIERS = (100, 1000, 5000)
+
+# Heavy modules imported before each measurement
+PRELOADED_MODULES = ('docx', 'docx.oxml', 'lxml.etree', 'PIL.Image')
+
+
+def generate_template(path, tables=1, rows=10, columns=5, merged_header=True,
+                      placeholders=0, images=0, filled=False):
+    """
+    Write a synthetic .docx template.
+    :param path: Output .docx path.
+    :param tables: Number of tables.
+    :param rows: Rows per table, including the header row.
+    :param columns: Columns per table.
+    :param merged_header: Merge the first two header cells of each table.
+    :param placeholders: Number of "{{field_N}}" placeholders in body paragraphs; every
+                         other one is split across two runs, as Word often does.
+    :param images: Number of embedded PNG images.
+    :param filled: Put text in the body rows instead of leaving them empty.
+    """
+    from docx import Document
+    from docx.shared import Inches
+
+    doc = Document()
+    for index in range(placeholders):
+        paragraph = doc.add_paragraph(f"Field {index}: ")
+        if index % 2:
+            paragraph.add_run(f"{{{{field_{index}")
+            paragraph.add_run("}}")
+        else:
+            paragraph.add_run(f"{{{{field_{index}}}}}")
+
+    for index in range(images):
+        doc.add_picture(io.BytesIO(_png_bytes(200 + index, 80)), width=Inches(2))
+
+    for table_index in range(tables):
+        table = doc.add_table(rows=rows, cols=columns)
+        table.style = 'Table Grid'
+        for column, cell in enumerate(table.rows[0].cells):
+            cell.text = f"Column {column}"
+        if filled:
+            for row_index, row in enumerate(table.rows[1:], 1):
+                for column, cell in enumerate(row.cells):
+                    cell.text = f"R{row_index}C{column}"
+        if merged_header and columns > 1:
+            table.cell(0, 0).merge(table.cell(0, 1))
+    doc.save(path)
+    return path
+
+
+def generate_csv(path, rows, columns=3):
+    """
+    Write a synthetic CSV with a header row and `rows` data rows.
+    """
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([f"Column {column}" for column in range(columns)])
+        for row in range(rows):
+            writer.writerow([f"R{row}C{column}" for column in range(columns)])
+    return path
+
+
+def _png_bytes(width, height):
+    """
+    Return a simple PNG image as bytes.
+    """
+    from PIL import Image, ImageDraw
+    img = Image.new('RGB', (width, height), 'white')
+    ImageDraw.Draw(img).line((0, height, width, 0), fill='black', width=3)
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _write_png(path, width, height):
+    """
+    Write a simple PNG image to `path`.
+    """
+    with open(path, 'wb') as f:
+        f.write(_png_bytes(width, height))
+    return path
+
+
+def _prepared(generate, path, *args, **kwargs):
+    """
+    Return `path`, calling generate(path, ...) first only if it does not exist yet.
+    Inputs are generated in a separate process beforehand (see _prepare_case), so
+    that generating them does not count towards the measured process's peak memory.
+    """
+    if not os.path.exists(path):
+        generate(path, *args, **kwargs)
+    return path
+
+
+# Benchmark cases: each takes (workdir, size), prepares its inputs untimed and
+# returns the operation to time. The operation returns an output path or None.
+
+def _case_analyze_document(workdir, size):
+    template = _prepared(generate_template, os.path.join(workdir, 'template.docx'), rows=size, filled=True)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            docx_utils.analyze_document(template)
+    return run
+
+
+def _case_populate_table_from_csv(workdir, size):
+    template = _prepared(generate_template, os.path.join(workdir, 'template.docx'), rows=size + 1, columns=3)
+    data = _prepared(generate_csv, os.path.join(workdir, 'data.csv'), size)
+    output = os.path.join(workdir, 'output.docx')
+
+    def run():
+        from docx import Document
+        doc = Document(template)
+        docx_utils.populate_table_from_csv(doc, data, table_index=0)
+        doc.save(output)
+        return output
+    return run
+
+
+def _case_populate_table_from_csv_stream(workdir, size):
+    template = _prepared(generate_template, os.path.join(workdir, 'template.docx'), rows=6, columns=3)
+    data = _prepared(generate_csv, os.path.join(workdir, 'data.csv'), size)
+    output = os.path.join(workdir, 'output.docx')
+
+    def run():
+        from docx import Document
+        doc = Document(template)
+        with contextlib.redirect_stdout(io.StringIO()):
+            docx_utils.populate_table_from_csv(doc, data, table_index=0, stream=True)
+        doc.save(output)
+        return output
+    return run
+
+
+def _case_add_row_to_table(workdir, size):
+    template = _prepared(generate_template, os.path.join(workdir, 'template.docx'), rows=2)
+    output = os.path.join(workdir, 'output.docx')
+
+    def run():
+        from docx import Document
+        doc = Document(template)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for row in range(size):
+                docx_utils.add_row_to_table(doc, 0, [f"R{row}C{column}" for column in range(5)])
+        doc.save(output)
+        return output
+    return run
+
+
+def _case_add_rows(workdir, size):
+    template = _prepared(generate_template, os.path.join(workdir, 'template.docx'), rows=2)
+    output = os.path.join(workdir, 'output.docx')
+
+    def run():
+        from docx import Document
+        doc = Document(template)
+        docx_utils.add_rows(doc, 0, ([f"R{row}C{column}" for column in range(5)] for row in range(size)))
+        doc.save(output)
+        return output
+    return run
+
+
+def _case_delete_row_from_table(workdir, size):
+    template = _prepared(generate_template, os.path.join(workdir, 'template.docx'), rows=size + 1, filled=True)
+    output = os.path.join(workdir, 'output.docx')
+
+    def run():
+        from docx import Document
+        doc = Document(template)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(size // 2):
+                docx_utils.delete_row_from_table(doc, 0, 1)
+        doc.save(output)
+        return output
+    return run
+
+
+def _case_delete_rows(workdir, size):
+    template = _prepared(generate_template, os.path.join(workdir, 'template.docx'), rows=size + 1, filled=True)
+    output = os.path.join(workdir, 'output.docx')
+
+    def run():
+        from docx import Document
+        doc = Document(template)
+        docx_utils.delete_rows(doc, 0, range(1, size + 1, 2))
+        doc.save(output)
+        return output
+    return run
+
+
+def _case_add_signature_to_cell(workdir, size):
+    template = _prepared(generate_template, os.path.join(workdir, 'template.docx'), rows=size + 1)
+    signature = _prepared(_write_png, os.path.join(workdir, 'signature.png'), 600, 200)
+    output = os.path.join(workdir, 'output.docx')
+
+    def run():
+        from docx import Document
+        doc = Document(template)
+        table = doc.tables[0]
+        with contextlib.redirect_stdout(io.StringIO()):
+            for row in table.rows[1:]:
+                docx_utils.add_signature_to_cell(row.cells[4], signature)
+        doc.save(output)
+        return output
+    return run
+
+
+def _case_extract_modify_repack(workdir, size):
+    template = _prepared(generate_template, os.path.join(workdir, 'template.docx'), placeholders=size, images=3)
+    replacements = {f"{{{{field_{index}}}}}": f"value {index}" for index in range(size)}
+    output = os.path.join(workdir, 'output.docx')
+
+    def run():
+        extract_dir = os.path.join(workdir, 'extracted')
+        docx_utils.extract_docx(template, extract_dir)
+        docx_utils.modify_document_xml(os.path.join(extract_dir, 'word', 'document.xml'), replacements)
+        docx_utils.repack_docx(extract_dir, output)
+        shutil.rmtree(extract_dir)
+        return output
+    return run
+
+
+def _case_replace_text_in_docx(workdir, size):
+    template = _prepared(generate_template, os.path.join(workdir, 'template.docx'), placeholders=size, images=3)
+    replacements = {f"{{{{field_{index}}}}}": f"value {index}" for index in range(size)}
+    output = os.path.join(workdir, 'output.docx')
+
+    def run():
+        docx_utils.replace_text_in_docx(template, output, replacements)
+        return output
+    return run
+
+
+CASES = {
+    "analyze_document": _case_analyze_document,
+    "populate_table_from_csv": _case_populate_table_from_csv,
+    "populate_table_from_csv_stream": _case_populate_table_from_csv_stream,
+    "add_row_to_table": _case_add_row_to_table,
+    "add_rows": _case_add_rows,
+    "delete_row_from_table": _case_delete_row_from_table,
+    "delete_rows": _case_delete_rows,
+    "add_signature_to_cell": _case_add_signature_to_cell,
+    "extract_modify_repack": _case_extract_modify_repack,
+    "replace_text_in_docx": _case_replace_text_in_docx,
+}
+
+
+def _peak_memory_kb():
+    """
+    Return the process's peak resident set size in KiB, or None where unavailable.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _prepare_case(name, size, workdir):
+    """
+    Generate one case's inputs in `workdir`; run in its own process.
+    """
+    CASES[name](workdir, size)
+
+
+def _run_case(name, size, workdir):
+    """
+    Run one case in the current (fresh) process on inputs already generated in
+    `workdir`, and return its measurements.
+    """
+    # docx_utils imports these lazily; load them first so that neither the import time
+    # nor the imported modules' memory is counted as the operation's
+    for module in PRELOADED_MODULES:
+        importlib.import_module(module)
+    run = CASES[name](workdir, size)
+    memory_before = _peak_memory_kb()
+    start = time.perf_counter()
+    output = run()
+    wall = time.perf_counter() - start
+    memory_after = _peak_memory_kb()
+    return {
+        "case": name,
+        "size": size,
+        "wall_seconds": round(wall, 6),
+        "peak_rss_kb": memory_after,
+        "peak_rss_growth_kb": memory_after - memory_before if memory_after is not None else None,
+        "output_bytes": os.path.getsize(output) if output else None,
+    }
+
+
+def run_benchmarks(cases, tiers, results_file, repeat=1):
+    """
+    Run every case at every size tier, each in a fresh process so that peak memory is
+    per case, and append one JSON line per run to `results_file`. Inputs are generated
+    in another process first, so the peak memory is the operation's own.
+    :return: List of result dicts.
+    """
+    context = multiprocessing.get_context('spawn')
+    run_info = {
+        "run_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+    results = []
+    with open(results_file, 'a', encoding='utf-8') as f:
+        for name in cases:
+            for size in tiers:
+                for _ in range(repeat):
+                    with tempfile.TemporaryDirectory(prefix='docx_bench_') as workdir:
+                        with context.Pool(1) as pool:
+                            pool.apply(_prepare_case, (name, size, workdir))
+                        with context.Pool(1) as pool:
+                            result = dict(run_info, **pool.apply(_run_case, (name, size, workdir)))
+                    print(f"{name:32} size={size:<8} {result['wall_seconds']:9.3f}s "
+                          f"peak={result['peak_rss_kb']}KiB output={result['output_bytes']}")
+                    f.write(json.dumps(result) + "\n")
+                    f.flush()
+                    results.append(result)
+    return results
+
+
+def load_results(results_file):
+    """
+    Load benchmark results, keeping the fastest run per (case, size).
+    """
+    best = {}
+    with open(results_file, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                result = json.loads(line)
+                key = (result["case"], result["size"])
+                if key not in best or result["wall_seconds"] < best[key]["wall_seconds"]:
+                    best[key] = result
+    return best
+
+
+def compare_results(baseline_file, current_file):
+    """
+    Print the wall-time ratio current/baseline for each (case, size) found in both files.
+    """
+    baseline = load_results(baseline_file)
+    current = load_results(current_file)
+    for key in sorted(set(baseline) & set(current)):
+        before = baseline[key]["wall_seconds"]
+        after = current[key]["wall_seconds"]
+        ratio = after / before if before else float('inf')
+        print(f"{key[0]:32} size={key[1]:<8} {before:9.3f}s -> {after:9.3f}s  x{ratio:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark docx_utils operations on synthetic documents.")
+    parser.add_argument("--cases", default="all", help=f"Comma-separated cases or 'all': {', '.join(CASES)}")
+    parser.add_argument("--tiers", default=",".join(map(str, DEFAULT_TIERS)), help="Comma-separated sizes")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case and size")
+    parser.add_argument("--results", default="bench_results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare --results against a baseline JSONL")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(args.compare, args.results)
+    else:
+        selected = list(CASES) if args.cases == "all" else args.cases.split(",")
+        run_benchmarks(selected, [int(size) for size in args.tiers.split(",")], args.results, args.repeat)
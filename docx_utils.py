@@ -1,20 +1,35 @@
 import os
+import io
+import re
+import bisect
+import copy
+import hashlib
+import struct
 import zipfile
 import csv
-from docx.shared import Inches
-from PIL import Image
-from PIL import ImageOps
-from docx.oxml import OxmlElement
-from lxml import etree
-from docx import Document
-import pypandoc
-import win32com.client
+import json
+import contextlib
+from collections import OrderedDict
+from instrumentation import span, count, log, log_error
+
+WORD_NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+NAMESPACES = {'w': WORD_NAMESPACE}
+W_BODY = '{%s}body' % WORD_NAMESPACE
+W_TBL = '{%s}tbl' % WORD_NAMESPACE
+W_TR = '{%s}tr' % WORD_NAMESPACE
+W_TC = '{%s}tc' % WORD_NAMESPACE
+W_P = '{%s}p' % WORD_NAMESPACE
+W_T = '{%s}t' % WORD_NAMESPACE
+W_PPR = '{%s}pPr' % WORD_NAMESPACE
+W_TCPR = '{%s}tcPr' % WORD_NAMESPACE
+W_VAL = '{%s}val' % WORD_NAMESPACE
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
 
 def extract_docx(docx_path, extract_dir):
     """
     Extracts a .docx file into a specified directory.
     """
-    with zipfile.ZipFile(docx_path, 'r') as zip_ref:
+    with span("extract"), zipfile.ZipFile(docx_path, 'r') as zip_ref:
         zip_ref.extractall(extract_dir)
 
 
@@ -24,69 +39,260 @@ def analyze_document(docx_file):
     including handling merged cells and skipping empty rows.
     """
     print(f"Analyzing document: {docx_file}")
-    doc = Document(docx_file)
+    inventory = inventory_document(docx_file)
+
+    for table in inventory["tables"]:
+        print(f"\nTable {table['index']}:")
+        for row in table["rows"]:
+            # Skip rows that are completely empty
+            if row["empty"]:
+                print(f" Row {row['index']}: <empty row>")
+            else:
+                row_data = [cell["text"].strip() or "<empty>" for cell in row["cells"]]
+                print(f" Row {row['index']}: {row_data}")
 
-    for table_index, table in enumerate(doc.tables):
-        print(f"\nTable {table_index}:")
-        for row_index, row in enumerate(table.rows):
-            row_data = []
-            for cell in row.cells:
-                # Check if the cell is merged or empty
-                cell_text = cell.text.strip()
-                if not cell_text:
-                    cell_text = "<empty>"
+    # Tables in content controls, text boxes etc. have no index in doc.tables
+    for table in inventory.get("other_tables", []):
+        print(f"\nTable in {table['location']} (not in doc.tables, so it has no table index):")
+        for row in table["rows"]:
+            row_data = [cell["text"].strip() or "<empty>" for cell in row["cells"]]
+            print(f" Row {row['index']}: {row_data}")
 
-                # Append cell data to the row
-                row_data.append(cell_text)
 
-            # Skip rows that are completely empty
-            if all(cell == "<empty>" for cell in row_data):
-                print(f" Row {row_index}: <empty row>")
+INVENTORY_CACHE_SIZE = 128
+_inventory_cache = OrderedDict()
+
+
+def inventory_document(docx_file, cache_dir=None):
+    """
+    Describe the tables of a .docx by streaming word/document.xml with iterparse.
+    Processed elements are cleared as parsing goes, so memory stays bounded on large
+    documents. Results are cached in memory (and in `cache_dir` as JSON, if given)
+    keyed by the file's content hash; treat the returned dict as read-only.
+
+    The result is JSON-serialisable:
+    {"sha256": ..., "tables": [{"index", "grid_columns", "rows": [{"index", "empty",
+    "cells": [{"text", "grid_span", "v_merge", "tables"?}]}]}], "other_tables": [...]}
+    where "v_merge" is None, "restart" or "continue" and nested tables appear under
+    their cell's "tables". "tables" holds only the tables that are direct children of
+    the body, numbered as in `doc.tables`. Tables inside content controls, text boxes
+    or alternate content go in "other_tables", with "index" None and a "location" path
+    such as "sdt/sdtContent".
+    """
+    digest = file_sha256(docx_file)
+    # "-v2": older cached inventories counted tables outside the body as top-level tables
+    cache_path = os.path.join(cache_dir, f"{digest}-v2.json") if cache_dir else None
+
+    inventory = _inventory_cache.get(digest)
+    if inventory is not None:
+        _inventory_cache.move_to_end(digest)
+    elif cache_path and os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as f:
+            inventory = json.load(f)
+    else:
+        with span("parse", operation="inventory"), zipfile.ZipFile(docx_file, 'r') as zip_ref, \
+                zip_ref.open('word/document.xml') as stream:
+            tables, other_tables = _iter_inventory_tables(stream)
+            inventory = {"sha256": digest, "tables": tables, "other_tables": other_tables}
+
+    if cache_path and not os.path.exists(cache_path):
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(inventory, f, ensure_ascii=False)
+
+    _inventory_cache[digest] = inventory
+    if len(_inventory_cache) > INVENTORY_CACHE_SIZE:
+        _inventory_cache.popitem(last=False)
+    return inventory
+
+
+def _iter_inventory_tables(stream):
+    """
+    Build the table lists of inventory_document from a document.xml stream.
+    :return: (body-level tables, other top-level tables).
+    """
+    from lxml import etree
+    tables = []
+    other_tables = []
+    stack = []  # Open tables, innermost last
+    events = etree.iterparse(stream, events=('start', 'end'), tag=(W_TBL, W_TR, W_TC, W_P))
+
+    for event, elem in events:
+        if event == 'start':
+            if elem.tag == W_TBL:
+                stack.append({"index": None, "grid_columns": 0, "rows": [], "nested": []})
+            elif elem.tag == W_TR and stack:
+                rows = stack[-1]["rows"]
+                rows.append({"index": len(rows), "empty": True, "cells": []})
+            continue
+
+        if elem.tag == W_TC:
+            frame = stack[-1]
+            cell = {
+                "text": _tc_text(elem),
+                "grid_span": _tc_pr_value(elem, 'gridSpan', 1),
+                "v_merge": _tc_pr_value(elem, 'vMerge', None),
+            }
+            if frame["nested"]:
+                cell["tables"] = frame["nested"]
+                frame["nested"] = []
+            row = frame["rows"][-1]
+            row["cells"].append(cell)
+            if cell["text"].strip():
+                row["empty"] = False
+            elem.clear(keep_tail=True)  # The cell is fully read
+        elif elem.tag == W_TR:
+            # Drop the finished row and the row shells before it; tblPr/tblGrid stay
+            elem.clear(keep_tail=True)
+            previous = elem.getprevious()
+            while previous is not None and previous.tag == W_TR:
+                elem.getparent().remove(previous)
+                previous = elem.getprevious()
+        elif elem.tag == W_TBL:
+            frame = stack.pop()
+            frame["grid_columns"] = len(elem.findall('w:tblGrid/w:gridCol', NAMESPACES))
+            del frame["nested"]
+            if stack:
+                stack[-1]["nested"].append(frame)
+            elif elem.getparent().tag == W_BODY:
+                frame["index"] = len(tables)
+                tables.append(frame)
             else:
-                print(f" Row {row_index}: {row_data}")
+                frame["location"] = _body_path(elem)
+                other_tables.append(frame)
+
+        if not stack and elem.tag in (W_TBL, W_P):
+            # Top-level body content is done with; drop it and everything before it
+            elem.clear(keep_tail=True)
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+    return tables, other_tables
 
 
-def add_signature_to_cell(cell, image_path):
+def _body_path(elem):
+    """
+    Return the local names of the elements between <w:body> and `elem`, e.g. "sdt/sdtContent".
+    """
+    names = []
+    parent = elem.getparent()
+    while parent is not None and parent.tag != W_BODY:
+        names.append(parent.tag.rsplit('}', 1)[-1])
+        parent = parent.getparent()
+    return '/'.join(reversed(names))
+
+
+def _tc_pr_value(tc, name, default):
+    """
+    Return the w:val of a <w:tcPr> child such as gridSpan or vMerge; `default` if the
+    child is missing, and "continue" for a bare <w:vMerge/>.
+    """
+    tcPr = tc.find(W_TCPR)
+    prop = tcPr.find(f'{{{WORD_NAMESPACE}}}{name}') if tcPr is not None else None
+    if prop is None:
+        return default
+    value = prop.get(W_VAL)
+    if name == 'vMerge':
+        return value or 'continue'
+    return int(value) if name == 'gridSpan' and value else value
+
+
+def file_sha256(path):
+    """
+    Return the SHA-256 hex digest of a file, read in chunks.
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def add_signature_to_cell(cell, image_path, dpi=96):
     """
     Add a signature image to a table cell, resize it, and adjust the row height.
+    Errors are logged rather than raised; use insert_signature() to have them raised.
     :param cell: The table cell where the image will be added.
     :param image_path: Path to the signature image file.
+    :param dpi: Resolution the image is resampled to for the cell width.
     """
     try:
-        print(f"Adding signature to cell: {image_path}")
-        # Clear existing text
-        cell.text = ""
-
-        # Get the approximate cell width
-        cell_width = get_cell_width(cell)
-        if not cell_width:
-            cell_width = 1.0  # Default to 1 inch if width cannot be determined
-
-        print(f"Cell width: {cell_width} inches")
-
-        # Open the image and resize it to fit the cell
-        with Image.open(image_path) as img:
-            aspect_ratio = img.width / img.height
-            img_width = cell_width * 96  # Convert inches to pixels (assuming 96 DPI)
-            img_height = img_width / aspect_ratio
-
-            print(f"Image resized to width: {img_width}px, height: {img_height}px")
-
-            # Save resized image to a temporary file
-            resized_image_path = "resized_signature.png"
-            img = img.resize((int(img_width), int(img_height)), Image.Resampling.LANCZOS)
-            img.save(resized_image_path)
-
-        # Add the resized image to the cell
-        paragraph = cell.paragraphs[0]
-        run = paragraph.add_run()
-        run.add_picture(resized_image_path, width=Inches(cell_width))
-
-        # Adjust the row height to fit the image
-        adjust_row_height(cell._tc, img_height)
-        print(f"Signature added successfully to cell.")
+        insert_signature(cell, image_path, dpi)
     except Exception as e:
-        print(f"Error adding signature: {e}")
+        log_error(f"Error adding signature: {e}")
+
+
+def insert_signature(cell, image_path, dpi=96):
+    """
+    Add a signature image to a table cell as add_signature_to_cell() does, raising on
+    failure. The image is loaded and resized before the cell is cleared, so a missing
+    or unreadable image leaves the cell untouched.
+    """
+    from docx.shared import Inches
+    log(f"Adding signature to cell: {image_path}")
+
+    # Get the approximate cell width
+    cell_width = get_cell_width(cell)
+    if not cell_width:
+        cell_width = 1.0  # Default to 1 inch if width cannot be determined
+
+    log(f"Cell width: {cell_width} inches")
+
+    # Resize the image to fit the cell (cached per image content, width and DPI)
+    image_bytes, aspect_ratio = get_resized_signature(image_path, cell_width, dpi)
+    img_height = cell_width * 96 / aspect_ratio  # Displayed height in pixels at 96 DPI
+
+    # Clear existing text
+    cell.text = ""
+
+    # Add the resized image to the cell; identical bytes share one image part
+    paragraph = cell.paragraphs[0]
+    run = paragraph.add_run()
+    run.add_picture(io.BytesIO(image_bytes), width=Inches(cell_width))
+    count("images_embedded")
+
+    # Adjust the row height to fit the image
+    adjust_row_height(cell._tc, img_height)
+    log("Signature added successfully to cell.")
+
+
+SIGNATURE_CACHE_SIZE = 64
+_signature_cache = OrderedDict()
+
+
+def get_resized_signature(image_path, cell_width, dpi=96):
+    """
+    Return the signature resized to `cell_width` inches at `dpi` as PNG bytes, plus the
+    image's aspect ratio. Results are kept in an LRU cache keyed by (content hash, width,
+    DPI), so a signature stamped into many cells or documents is only resized once and
+    always yields the same bytes, which python-docx stores as a single image part.
+    """
+    from PIL import Image
+    with open(image_path, 'rb') as f:
+        source = f.read()
+    key = (hashlib.sha256(source).hexdigest(), round(cell_width * dpi), dpi)
+
+    cached = _signature_cache.get(key)
+    if cached is not None:
+        _signature_cache.move_to_end(key)
+        return cached
+
+    with span("image_resize"), Image.open(io.BytesIO(source)) as img:
+        aspect_ratio = img.width / img.height
+        img_width = cell_width * dpi  # Convert inches to pixels
+        img_height = img_width / aspect_ratio
+
+        log(f"Image resized to width: {img_width}px, height: {img_height}px")
+
+        img = img.resize((int(img_width), int(img_height)), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG')
+
+    cached = (buffer.getvalue(), aspect_ratio)
+    _signature_cache[key] = cached
+    if len(_signature_cache) > SIGNATURE_CACHE_SIZE:
+        _signature_cache.popitem(last=False)
+    return cached
+
 
 def adjust_row_height(tc, img_height_px):
     """
@@ -94,10 +300,11 @@ def adjust_row_height(tc, img_height_px):
     :param tc: The table cell's underlying XML element.
     :param img_height_px: The image height in pixels.
     """
+    from docx.oxml import OxmlElement
     try:
-        print(f"Adjusting row height for image height: {img_height_px}px")
+        log(f"Adjusting row height for image height: {img_height_px}px")
         img_height_twips = int(img_height_px * 15)  # Convert pixels to twips
-        print(f"Calculated row height: {img_height_twips} twips")
+        log(f"Calculated row height: {img_height_twips} twips")
 
         # Get the parent row
         tr = tc.getparent()
@@ -109,9 +316,9 @@ def adjust_row_height(tc, img_height_px):
         rowHeight.set('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}hRule', 'exact')
         trPr.append(rowHeight)
 
-        print(f"Row height adjusted to: {img_height_twips} twips")
+        log(f"Row height adjusted to: {img_height_twips} twips")
     except Exception as e:
-        print(f"Error adjusting row height: {e}")
+        log_error(f"Error adjusting row height: {e}")
 
 
 def get_cell_width(cell):
@@ -127,49 +334,228 @@ def get_cell_width(cell):
             width_inches = width_twips / 1440  # Convert twips to inches
             return width_inches
         else:
-            print("Cell width could not be determined; using default.")
+            log("Cell width could not be determined; using default.")
             return None
     except Exception as e:
-        print(f"Error calculating cell width: {e}")
+        log_error(f"Error calculating cell width: {e}")
         return None
 
 
 
+class TextReplacer:
+    """
+    A replacement map compiled once into a single trie-shaped regular expression.
+
+    Text is matched per paragraph over the concatenated text of its runs, so
+    placeholders Word has split across several runs are still found. Each match is
+    written into the run where it starts, keeping that run's formatting, and removed
+    from the runs it spilled into. Overlapping keys resolve to the longest match.
+    """
+
+    def __init__(self, replacements):
+        """
+        :param replacements: Mapping of old text to new text.
+        """
+        self.replacements = {old: new for old, new in replacements.items() if old}
+        self.pattern = re.compile(_trie_pattern(self.replacements)) if self.replacements else None
+
+    def replace_in_tree(self, root):
+        """
+        Apply the replacements to every paragraph under `root` in place.
+        :return: Number of replacements made.
+        """
+        if self.pattern is None:
+            return 0
+
+        # Group text nodes by their nearest enclosing paragraph, in document order
+        paragraphs = OrderedDict()
+        for t in root.iter(W_T):
+            p = next(t.iterancestors(W_P), None)
+            paragraphs.setdefault(p, []).append(t)
+
+        replaced = 0
+        for text_elements in paragraphs.values():
+            replaced += self._replace_in_runs(text_elements)
+        count("replacements", replaced)
+        return replaced
+
+    def _replace_in_runs(self, text_elements):
+        texts = [t.text or '' for t in text_elements]
+        text = ''.join(texts)
+        if not self.pattern.search(text):
+            return 0
+
+        starts = []
+        offset = 0
+        for part in texts:
+            starts.append(offset)
+            offset += len(part)
+        pieces = [[] for _ in texts]
+
+        def copy_span(begin, end):
+            # Give each original character in [begin, end) back to the node that held it
+            index = bisect.bisect_right(starts, begin) - 1
+            while begin < end:
+                node_end = starts[index] + len(texts[index])
+                stop = min(end, node_end)
+                if stop > begin:
+                    pieces[index].append(text[begin:stop])
+                    begin = stop
+                index += 1
+
+        position = 0
+        replaced = 0
+        for match in self.pattern.finditer(text):
+            copy_span(position, match.start())
+            owner = bisect.bisect_right(starts, match.start()) - 1
+            pieces[owner].append(self.replacements[match.group()])
+            position = match.end()
+            replaced += 1
+        copy_span(position, len(text))
+
+        for t, original, new_pieces in zip(text_elements, texts, pieces):
+            new_text = ''.join(new_pieces)
+            if new_text != original:
+                t.text = new_text
+                t.set(XML_SPACE, 'preserve')
+        return replaced
+
+
+def _trie_pattern(keys):
+    """
+    Build a regular expression matching any of `keys`, shaped as a character trie so
+    that matching cost does not grow with the number of keys sharing a prefix.
+    """
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        terminal = '' in node
+        branches = [re.escape(char) + build(child) for char, child in node.items() if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if terminal else body
+
+    return build(trie)
+
+
 def modify_document_xml(document_xml_path, replacements):
     """
     Modifies the document.xml file by replacing specified text.
+    :param replacements: Mapping of old text to new text, or a compiled TextReplacer.
     """
-    parser = etree.XMLParser(ns_clean=True, recover=True)
-    tree = etree.parse(document_xml_path, parser)
-    root = tree.getroot()
-    namespaces = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
+    from lxml import etree
+    if not isinstance(replacements, TextReplacer):
+        replacements = TextReplacer(replacements)
 
-    for text_element in root.xpath('.//w:t', namespaces=namespaces):
-        if text_element.text and any(old_text in text_element.text for old_text in replacements):
-            for old_text, new_text in replacements.items():
-                if old_text in text_element.text:
-                    text_element.text = text_element.text.replace(old_text, new_text)
+    with span("replace", part=os.path.basename(document_xml_path)):
+        parser = etree.XMLParser(ns_clean=True, recover=True)
+        tree = etree.parse(document_xml_path, parser)
+        replacements.replace_in_tree(tree.getroot())
 
-    tree.write(document_xml_path, xml_declaration=True, encoding='UTF-8', standalone="yes")
+        tree.write(document_xml_path, xml_declaration=True, encoding='UTF-8', standalone="yes")
 
 
 def repack_docx(extract_dir, output_docx_path):
     """
     Repackages the extracted files back into a .docx file.
     """
-    with zipfile.ZipFile(output_docx_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+    with span("repack"), zipfile.ZipFile(output_docx_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
         for root_dir, dirs, files in os.walk(extract_dir):
             for file in files:
                 file_path = os.path.join(root_dir, file)
                 arcname = os.path.relpath(file_path, extract_dir)
                 zipf.write(file_path, arcname)
+    count("bytes_written", os.path.getsize(output_docx_path))
 
 
-def populate_table_0(table):
+def rewrite_docx(input_docx, output_docx, transforms):
+    """
+    Rewrite a .docx zip into a new one without extracting it to disk.
+    Members named in `transforms` are read, passed through their callback and
+    re-compressed; every other member's compressed bytes are copied straight through.
+    :param input_docx: Path or binary file object of the source .docx.
+    :param output_docx: Path or binary file object for the rewritten .docx.
+    :param transforms: Mapping of member name (e.g. 'word/document.xml') to a
+                       callable taking and returning the member's bytes.
+    """
+    with span("repack", operation="rewrite"), zipfile.ZipFile(input_docx, 'r') as zin, \
+            zipfile.ZipFile(output_docx, 'w', zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            transform = transforms.get(info.filename)
+            if transform is None:
+                _copy_zip_member(zin, zout, info)
+            else:
+                data = transform(zin.read(info))
+                new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                new_info.compress_type = zipfile.ZIP_DEFLATED
+                new_info.external_attr = info.external_attr
+                zout.writestr(new_info, data)
+    if isinstance(output_docx, (str, os.PathLike)):
+        count("bytes_written", os.path.getsize(output_docx))
+    else:
+        count("bytes_written", output_docx.tell())
+
+
+def _copy_zip_member(zin, zout, info):
+    """
+    Copy one member's compressed bytes from `zin` to `zout` without recompressing.
+    zipfile has no public API for this, so the local header is rebuilt from `info`
+    and the raw data appended at the writer's current end of data.
+    """
+    zin.fp.seek(info.header_offset)
+    header = struct.unpack(zipfile.structFileHeader, zin.fp.read(zipfile.sizeFileHeader))
+    zin.fp.seek(header[10] + header[11], os.SEEK_CUR)  # Skip file name and extra field
+    raw = zin.fp.read(info.compress_size)
+
+    new_info = copy.copy(info)
+    new_info.flag_bits &= ~0x08  # Sizes and CRC are known, so no data descriptor
+    new_info.extra = b''
+    zout.fp.seek(zout.start_dir)
+    new_info.header_offset = zout.start_dir
+    zout.fp.write(new_info.FileHeader())
+    zout.fp.write(raw)
+    zout.start_dir = zout.fp.tell()
+    zout.filelist.append(new_info)
+    zout.NameToInfo[new_info.filename] = new_info
+    zout._didModify = True
+
+
+def replace_text_in_docx(input_docx, output_docx, replacements, parts=('word/document.xml',)):
+    """
+    Replace text in a .docx in memory: only `parts` are parsed and recompressed,
+    all other members are copied through unchanged.
+    :param replacements: Mapping of old text to new text, or a compiled TextReplacer.
+    :return: Number of replacements made.
+    """
+    from lxml import etree
+    if not isinstance(replacements, TextReplacer):
+        replacements = TextReplacer(replacements)
+    counts = []
+
+    def transform(data):
+        root = etree.fromstring(data, etree.XMLParser(ns_clean=True, recover=True))
+        counts.append(replacements.replace_in_tree(root))
+        return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+    rewrite_docx(input_docx, output_docx, {part: transform for part in parts})
+    return sum(counts)
+
+
+def populate_table_0(table, data=None, label_index=None):
     """
     Populate specific fields in Table 0 with hardcoded data.
+    :param table: The table to populate.
+    :param data: Optional mapping of label text to value; defaults to the hardcoded data.
+    :param label_index: Index from compile_label_index for this table's template; the
+                        table is scanned for the labels if it is not given.
     """
-    table_0_data = {
+    table_0_data = data if data is not None else {
         "From:": "Ng, Wai Ming, Rock / 吳偉明 / 88888",
         "To:": "Tendering Committee",
         "Name of Property:": "AP- Apec Plaza",
@@ -177,22 +563,65 @@ def populate_table_0(table):
         "Tender Ref.:": "SHKP1234-001"
     }
 
-    for row in table.rows:
-        cells = row.cells
-        if len(cells) >= 2:
-            for i, cell in enumerate(cells):
-                if cell.text.strip() in table_0_data:
-                    key = cell.text.strip()
-                    cells[i + 1].text = table_0_data[key]
+    if label_index is None:
+        label_index = compile_label_index(table, table_0_data)
+    fill_label_index(table, label_index, table_0_data)
+
+
+def compile_label_index(table, labels):
+    """
+    Locate the label cells of a table once and record where their values go.
+    The result maps each label found to a list of [row index, cell index] targets
+    (the cell right after the label, counted in <w:tc> elements of the row). It is
+    plain JSON-serialisable data and is valid for every copy of the same template.
+    :param table: The template table to scan.
+    :param labels: Label texts to look for, e.g. "Tender Ref.:".
+    """
+    wanted = set(labels)
+    label_index = {}
+    for row_index, tr in enumerate(table._tbl.tr_lst):
+        cells = tr.tc_lst
+        for cell_index, tc in enumerate(cells[:-1]):
+            label = _tc_text(tc).strip()
+            if label in wanted:
+                label_index.setdefault(label, []).append([row_index, cell_index + 1])
+    return label_index
+
+
+def fill_label_index(table, label_index, data):
+    """
+    Write `data` into the target cells recorded by compile_label_index, touching
+    only those cells instead of scanning the table.
+    """
+    rows = table._tbl.tr_lst
+    for label, value in data.items():
+        for row_index, cell_index in label_index.get(label, ()):
+            _set_tc_text(rows[row_index].tc_lst[cell_index], value)
+            count("cells_written")
+
+
+def _tc_text(tc):
+    """
+    Return the text of a <w:tc>, one line per paragraph, as `cell.text` does.
+    """
+    return '\n'.join(''.join(p.itertext(W_T)) for p in tc.iterchildren(W_P))
 
 
-def populate_table_from_csv(doc, csv_file, table_index=1):
+def populate_table_from_csv(doc, csv_file, table_index=1, stream=False, batch_size=1000):
     """
     Populate Table 1 using data from a CSV file.
+    :param stream: Read the CSV row by row and append cloned rows once the empty rows
+                   run out, instead of loading the whole CSV and only filling existing rows.
+    :param batch_size: Number of appended rows inserted into the table at a time (stream mode).
     """
     table = doc.tables[table_index]
 
-    with open(csv_file, newline='', encoding='utf-8') as csvfile:
+    if stream:
+        with span("fill", operation="populate_table_from_csv", stream=True):
+            return _stream_table_from_csv(table, csv_file, batch_size)
+
+    with span("fill", operation="populate_table_from_csv", stream=False), \
+            open(csv_file, newline='', encoding='utf-8') as csvfile:
         reader = csv.DictReader(csvfile)  # Use DictReader for column matching
 
         csv_rows = list(reader)  # Load all rows into memory for better control
@@ -211,84 +640,300 @@ def populate_table_from_csv(doc, csv_file, table_index=1):
                 for col_name, cell in zip(reader.fieldnames, table_row.cells):
                     if col_name in csv_data:
                         cell.text = csv_data[col_name]
+                        count("cells_written")
 
                 csv_index += 1  # Move to the next CSV row
 
 
+def _stream_table_from_csv(table, csv_file, batch_size):
+    """
+    Stream the data rows of a CSV file into a table with stream_rows_into_table.
+    :return: Number of CSV rows written.
+    """
+    with open(csv_file, newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)  # Skip the header row; columns are matched by position
+        written = stream_rows_into_table(table, reader, batch_size)
 
-def add_row_to_table(doc, table_index, row_data):
+    log(f"Streamed {written} CSV rows into table.")
+    return written
+
+
+def stream_rows_into_table(table, rows, batch_size):
     """
-    Add a new row to the specified table with the given data and maintain formatting.
+    Fill the empty rows of a table from an iterable of value lists, then append clones
+    of the last empty row for the remaining rows, inserting them `batch_size` at a time.
+    Filled and appended rows alike take one value per <w:tc> in document order, so a
+    spanned cell holds one value. Works on the <w:tr> elements directly so no row/cell
+    proxies are built.
+    :return: Number of rows written.
     """
-    table = doc.tables[table_index]
+    tbl = table._tbl
+    empty_rows = (tr for tr in tbl.tr_lst if is_empty_row(tr))
+    row_template = None
+    anchor = None
+    pending = []
+    written = 0
 
-    # Use the last row as a template for formatting
-    template_row = table.rows[-1]
+    for values in rows:
+        tr = next(empty_rows, None)
+        if tr is not None:
+            anchor = tr
+            cells = tr.tc_lst
+            _report_dropped(values, len(cells))
+            for tc, value in zip(cells, values):
+                _set_tc_text(tc, value)
+        else:
+            if row_template is None:
+                if anchor is None:
+                    anchor = tbl.tr_lst[-1]
+                row_template = _RowTemplate(anchor)
+            pending.append(row_template.new_row(values))
+            count("rows_added")
+            if len(pending) >= batch_size:
+                anchor = _insert_rows_after(tbl, anchor, pending)
+                pending = []
+        written += 1
+        count("cells_written", len(values))
 
-    # Add a new row
-    new_row = table.add_row()
+    if pending:
+        _insert_rows_after(tbl, anchor, pending)
+    return written
 
-    # Populate the new row with the provided data
-    for i, cell_data in enumerate(row_data):
-        if i < len(new_row.cells):  # Ensure the data fits in the table
-            new_cell = new_row.cells[i]
-            new_cell.text = cell_data
 
-            # Copy formatting from the template row
-            template_cell = template_row.cells[i] if i < len(template_row.cells) else None
-            if template_cell:
-                _copy_cell_formatting(template_cell, new_cell)
+def estimate_rows_per_page(doc, table_index, default_row_height=274):
+    """
+    Roughly estimate how many rows of a table fit on one page: the first section's
+    usable page height divided by the height of the row stream_rows_into_table clones,
+    i.e. the table's last empty row, or its last row if none is empty. Rows with no
+    fixed height (<w:trHeight>) are assumed to hold one line of text. The table's
+    existing rows and any other body content in the template are not taken into
+    account, so the first page of a document holds fewer rows than estimated.
+    :param default_row_height: Row height in twips (1/1440 inch) when none is set.
+    :return: Estimated rows per page, at least 1.
+    """
+    section = doc.sections[0]
+    usable = section.page_height - section.top_margin - section.bottom_margin  # EMU
+    trs = doc.tables[table_index]._tbl.tr_lst
+    empty = [tr for tr in trs if is_empty_row(tr)]
+    tr = empty[-1] if empty else trs[-1]
+    height = tr.trHeight_val  # EMU, or None
+    if not height:
+        height = default_row_height * 635  # 635 EMU per twip
+    return max(1, int(usable // height))
+
 
-    print(f"Row added to Table {table_index} with data: {row_data}")
+class _RowTemplate:
+    """
+    A per-column formatting template: a blank copy of a <w:tr> that keeps each cell's
+    tcPr and pPr, plus each cell's run properties, captured once and stamped out for
+    every new row by deep copy. Values are written one per <w:tc>, in document order.
+    With `split_spans`, horizontally spanned cells are first split into one cell per
+    grid column, sized from the table grid, as `table.add_row()` would create them.
+    """
 
+    def __init__(self, tr, split_spans=False):
+        tbl = tr.getparent()
+        grid = tbl.tblGrid.gridCol_lst if tbl is not None and tbl.tblGrid is not None else []
+        self._tr = copy.deepcopy(tr)
+        self._rPrs = []
+        for tc in self._tr.tc_lst:
+            # Formatting of the first run, else of the paragraph mark; read before the
+            # cell is cleared, which removes its runs
+            rPr = tc.find('.//w:r/w:rPr', NAMESPACES)
+            if rPr is None:
+                rPr = tc.find('w:p/w:pPr/w:rPr', NAMESPACES)
+            self._rPrs.append(copy.deepcopy(rPr) if rPr is not None else None)
+            _set_tc_text(tc, "")
+            # New rows stand alone rather than continuing a vertical merge
+            for name in ('vMerge', 'hMerge'):
+                merge = tc.find(f'w:tcPr/w:{name}', NAMESPACES)
+                if merge is not None:
+                    merge.getparent().remove(merge)
+        if split_spans:
+            self._split_spans(grid)
+        self.columns = len(self._rPrs)
 
-def _copy_cell_formatting(template_cell, target_cell):
+    def _split_spans(self, grid):
+        """
+        Replace each <w:tc> spanning several grid columns with one copy per column,
+        each as wide as its grid column and with the same run properties.
+        """
+        column = self._tr.grid_before
+        rPrs = []
+        for tc, rPr in zip(list(self._tr.tc_lst), self._rPrs):
+            span = tc.grid_span
+            rPrs.extend([rPr] * span)
+            if span > 1:
+                tc.grid_span = 1
+                previous = tc
+                for offset in range(1, span):
+                    clone = copy.deepcopy(tc)
+                    if column + offset < len(grid) and grid[column + offset].w is not None:
+                        clone.width = grid[column + offset].w
+                    previous.addnext(clone)
+                    previous = clone
+                if column < len(grid) and grid[column].w is not None:
+                    tc.width = grid[column].w
+            column += span
+        self._rPrs = rPrs
+
+    def new_row(self, values):
+        """
+        Return a new <w:tr> holding `values`, one per cell. Values beyond the last
+        cell are dropped and reported.
+        """
+        tr = copy.deepcopy(self._tr)
+        cells = tr.findall(W_TC)
+        _report_dropped(values, len(cells))
+        for tc, rPr, text in zip(cells, self._rPrs, values):
+            if text:
+                tc.find(W_P).append(_new_run(text, rPr))
+        return tr
+
+
+def _report_dropped(values, cells):
     """
-    Copy the text formatting from the template cell to the target cell.
+    Report the values of a row that do not fit in its `cells` cells.
     """
-    # Copy paragraph alignment
-    if template_cell.paragraphs and target_cell.paragraphs:
-        target_cell.paragraphs[0].alignment = template_cell.paragraphs[0].alignment
-    template_paragraph = template_cell.paragraphs[0]
-    target_paragraph = target_cell.paragraphs[0]
+    if len(values) > cells:
+        log_error(f"Row has {len(values)} values but only {cells} cells; "
+                  f"dropped: {list(values[cells:])}")
+        count("values_dropped", len(values) - cells)
 
-    # Copy font settings
-    if template_paragraph.runs and target_paragraph.runs:
-        template_font = template_paragraph.runs[0].font
-        target_font = target_paragraph.runs[0].font
 
-        # Copy font size, name, and other attributes
-        if template_font.size:
-            target_font.size = template_font.size
-        if template_font.name:
-            target_font.name = template_font.name
-        target_font.bold = template_font.bold
-        target_font.italic = template_font.italic
-        target_font.underline = template_font.underline
+def is_empty_row(tr):
+    """
+    Return True if no cell of the <w:tr> contains any text.
+    """
+    return not any(t.text and not t.text.isspace() for t in tr.iter(W_T))
+
 
-    # Copy alignment (if needed)
-    target_paragraph.alignment = template_paragraph.alignment
+def _set_tc_text(tc, text):
+    """
+    Replace the content of a <w:tc> with a single paragraph holding `text`, keeping
+    the first paragraph's properties and the first run's properties.
+    """
+    paragraphs = tc.p_lst
+    if paragraphs:
+        p = paragraphs[0]
+        for extra in paragraphs[1:]:
+            tc.remove(extra)
+    else:
+        p = tc.add_p()
 
+    rPr = p.find('.//w:r/w:rPr', NAMESPACES)
+    for child in list(p):
+        if child.tag != W_PPR:
+            p.remove(child)
+    if text:
+        p.append(_new_run(text, rPr))
+
+
+def _new_run(text, rPr=None):
+    """
+    Build a <w:r> holding `text`, with a copy of `rPr` as its run properties.
+    Newlines become <w:br/> elements.
+    """
+    from docx.oxml import OxmlElement
+    r = OxmlElement('w:r')
+    if rPr is not None:
+        r.append(copy.deepcopy(rPr))
+    for line_index, line in enumerate(text.split('\n')):
+        if line_index:
+            r.append(OxmlElement('w:br'))
+        t = OxmlElement('w:t')
+        t.text = line
+        t.set(XML_SPACE, 'preserve')
+        r.append(t)
+    return r
+
+
+def _insert_rows_after(tbl, anchor, rows):
+    """
+    Insert a list of <w:tr> elements after `anchor` in a single slice assignment.
+    :return: The last inserted row, to be used as the next anchor.
+    """
+    position = tbl.index(anchor) + 1
+    tbl[position:position] = rows
+    return rows[-1]
+
+
+def add_row_to_table(doc, table_index, row_data):
+    """
+    Add a new row to the specified table with the given data and maintain formatting.
+    """
+    add_rows(doc, table_index, [row_data])
+    log(f"Row added to Table {table_index} with data: {row_data}")
+
+
+def add_rows(doc, table_index, rows, template_row_index=-1):
+    """
+    Append many rows to a table at once, formatted like a template row.
+    The template row's cell, paragraph and run properties are captured once and
+    deep-copied onto every new row, and all rows are inserted in one tree operation.
+    :param doc: The Document containing the table.
+    :param table_index: Index of the table.
+    :param rows: Iterable of rows, each a sequence of cell values by grid column.
+    :param template_row_index: Index of the row whose formatting is copied (default: last row).
+    :return: Number of rows added.
+    """
+    tbl = doc.tables[table_index]._tbl
+    trs = tbl.tr_lst
+    with span("fill", operation="add_rows"):
+        row_template = _RowTemplate(trs[template_row_index], split_spans=True)
+        new_rows = [row_template.new_row(row_data) for row_data in rows]
+        if new_rows:
+            _insert_rows_after(tbl, trs[-1], new_rows)
+    count("rows_added", len(new_rows))
+    return len(new_rows)
 
 
 def delete_row_from_table(doc, table_index, row_number):
     """
     Delete a specific row from the specified table.
     """
-    table = doc.tables[table_index]
-
-    if row_number < 0 or row_number >= len(table.rows):
-        print(f"Invalid row number: {row_number}")
+    if not delete_rows(doc, table_index, [row_number]):
+        log(f"Invalid row number: {row_number}")
         return
 
-    # Access the row to delete
-    row_to_delete = table.rows[row_number]
+    log(f"Row {row_number} deleted from Table {table_index}.")
 
-    # Remove the row from the table
-    tbl = table._tbl
-    tbl.remove(row_to_delete._tr)
 
-    print(f"Row {row_number} deleted from Table {table_index}.")
+def delete_rows(doc, table_index, row_numbers=(), predicate=None):
+    """
+    Delete many rows from the specified table in a single pass over its <w:tr> elements.
+    Row numbers refer to the table as it was before the call, so callers need not
+    compensate for earlier deletions. Vertically merged cells whose first row is deleted
+    restart on the next remaining row.
+    :param row_numbers: Indices of the rows to delete; indices out of range are ignored.
+    :param predicate: Optional callable(tr) returning True for further rows to delete,
+                      e.g. is_empty_row to drop unused placeholder rows.
+    :return: Number of rows deleted.
+    """
+    tbl = doc.tables[table_index]._tbl
+    row_numbers = set(row_numbers)
+    deleted = 0
+    restart_columns = set()  # Grid columns whose vertical merge lost its first row
+    for index, tr in enumerate(list(tbl.iterchildren(W_TR))):
+        delete = index in row_numbers or (predicate is not None and predicate(tr))
+        if delete or restart_columns:
+            column = 0
+            for tc in tr.iterchildren(W_TC):
+                v_merge = _tc_pr_value(tc, 'vMerge', None)
+                if delete:
+                    if v_merge == 'restart':
+                        restart_columns.add(column)
+                elif column in restart_columns:
+                    if v_merge == 'continue':
+                        tc.find(W_TCPR).find(f'{{{WORD_NAMESPACE}}}vMerge').set(W_VAL, 'restart')
+                    restart_columns.discard(column)
+                column += _tc_pr_value(tc, 'gridSpan', 1)
+        if delete:
+            tbl.remove(tr)
+            deleted += 1
+    count("rows_deleted", deleted)
+    return deleted
 
 
 def convert_to_pdf(input_docx, output_pdf):
@@ -296,11 +941,100 @@ def convert_to_pdf(input_docx, output_pdf):
     Convert a .docx file to .pdf using win32com.client (requires Microsoft Word).
     """
     try:
-        word = win32com.client.Dispatch("Word.Application")
-        doc = word.Documents.Open(input_docx)
-        doc.SaveAs(output_pdf, FileFormat=17)  # 17 is the constant for wdFormatPDF
-        doc.Close()
-        word.Quit()
-        print(f"PDF file created: {output_pdf}")
+        import win32com.client
+        with span("pdf_convert", backend="word"):
+            word = win32com.client.Dispatch("Word.Application")
+            doc = word.Documents.Open(input_docx)
+            doc.SaveAs(output_pdf, FileFormat=17)  # 17 is the constant for wdFormatPDF
+            doc.Close()
+            word.Quit()
+        log(f"PDF file created: {output_pdf}")
     except Exception as e:
-        print(f"Error during PDF conversion: {e}")
+        log_error(f"Error during PDF conversion: {e}")
+
+
+# Cold-import budget for this module; heavy and platform-specific dependencies
+# (python-docx, lxml, Pillow, pywin32) are imported inside the functions using them.
+IMPORT_TIME_BUDGET_MS = 100
+
+
+def measure_import_time(module='docx_utils', runs=5):
+    """
+    Measure the cumulative import time of `module` in fresh interpreters.
+    :return: Best of `runs` measurements, in milliseconds.
+    """
+    import subprocess
+    import sys
+    timings = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+        for line in completed.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].strip() == module:
+                timings.append(int(fields[1]) / 1000)
+    return min(timings)
+
+
+def main(argv=None):
+    """
+    Command-line entry point: python docx_utils.py <command> ...
+    """
+    import argparse
+    import instrumentation
+    parser = argparse.ArgumentParser(description="Inspect and edit .docx files.")
+    parser.add_argument('--verbose', action='store_true', help="Print progress messages")
+    parser.add_argument('--metrics', help="Append timing spans and counters to this JSONL file")
+    parser.add_argument('--profile', choices=('cprofile', 'tracemalloc'), help="Capture a profile")
+    parser.add_argument('--profile-output', default='docx_utils.prof', help="Profile output file")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    analyze = commands.add_parser('analyze', help="Print the tables of a document")
+    analyze.add_argument('docx')
+
+    inventory = commands.add_parser('inventory', help="Print the table inventory of a document as JSON")
+    inventory.add_argument('docx')
+    inventory.add_argument('--cache-dir', help="Directory for cached inventories")
+
+    replace = commands.add_parser('replace', help="Replace text in a document without extracting it")
+    replace.add_argument('input_docx')
+    replace.add_argument('output_docx')
+    replace.add_argument('replacements', nargs='+', metavar='OLD=NEW')
+
+    import_time = commands.add_parser('import-time', help="Check the module's cold import time")
+    import_time.add_argument('--budget', type=float, default=IMPORT_TIME_BUDGET_MS, help="Budget in ms")
+
+    args = parser.parse_args(argv)
+    instrumentation.set_verbose(args.verbose)
+    with contextlib.ExitStack() as stack:
+        if args.profile:
+            stack.enter_context(instrumentation.profile(args.profile, args.profile_output))
+        status = _run_command(args)
+    if args.metrics:
+        instrumentation.recorder.export_jsonl(args.metrics, command=args.command)
+    return status
+
+
+def _run_command(args):
+    """
+    Run the CLI command selected in `args`; return the exit status.
+    """
+    if args.command == 'analyze':
+        analyze_document(args.docx)
+    elif args.command == 'inventory':
+        print(json.dumps(inventory_document(args.docx, args.cache_dir), ensure_ascii=False, indent=1))
+    elif args.command == 'replace':
+        replacements = dict(pair.split('=', 1) for pair in args.replacements)
+        replaced = replace_text_in_docx(args.input_docx, args.output_docx, replacements)
+        print(f"Made {replaced} replacements; saved {args.output_docx}")
+    elif args.command == 'import-time':
+        elapsed = measure_import_time()
+        print(f"docx_utils imports in {elapsed:.1f} ms (budget {args.budget:.0f} ms)")
+        if elapsed > args.budget:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
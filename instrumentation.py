@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+from collections import defaultdict
+
+# Progress messages are only printed when verbose; set DOCX_VERBOSE=1 or call set_verbose()
+_verbose = os.environ.get("DOCX_VERBOSE", "") not in ("", "0")
+
+
+class Recorder:
+    """
+    Collects timing spans and counters for the current process.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.counters = defaultdict(int)
+        self.stage_totals = defaultdict(float)
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Span nesting is tracked per thread
+
+    @contextlib.contextmanager
+    def span(self, name, **fields):
+        """
+        Time the enclosed block as a named stage; nested spans record their parent.
+        """
+        stack = self._local.__dict__.setdefault("stack", [])
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            stack.pop()
+            event = {"type": "span", "name": name, "parent": parent,
+                     "started_at": round(started_at, 6), "seconds": round(seconds, 6)}
+            event.update(fields)
+            self.spans.append(event)
+
+    def count(self, name, value=1):
+        """
+        Add `value` to a named counter (e.g. rows_added, cells_written, bytes_written).
+        """
+        with self._lock:
+            self.counters[name] += value
+
+    def merge(self, summary):
+        """
+        Fold a summary() from another process (e.g. a pool worker) into this recorder.
+        """
+        with self._lock:
+            for name, seconds in summary["stages"].items():
+                self.stage_totals[name] += seconds
+            for name, value in summary["counters"].items():
+                self.counters[name] += value
+
+    def events(self):
+        """
+        Return all spans, then merged per-stage totals, then one event per counter.
+        """
+        totals = [{"type": "stage_total", "name": name, "seconds": round(seconds, 6)}
+                  for name, seconds in sorted(self.stage_totals.items())]
+        counters = [{"type": "counter", "name": name, "value": value}
+                    for name, value in sorted(self.counters.items())]
+        return self.spans + totals + counters
+
+    def summary(self):
+        """
+        Return total seconds per span name and the counters, as plain dicts.
+        """
+        stages = defaultdict(float, self.stage_totals)
+        for event in self.spans:
+            stages[event["name"]] += event["seconds"]
+        return {"stages": {name: round(seconds, 6) for name, seconds in stages.items()},
+                "counters": dict(self.counters)}
+
+    def drain(self):
+        """
+        Return summary() and start recording afresh.
+        """
+        summary = self.summary()
+        self.reset()
+        return summary
+
+    def reset(self):
+        self.spans = []
+        self.counters = defaultdict(int)
+        self.stage_totals = defaultdict(float)
+
+    def export_jsonl(self, path, **fields):
+        """
+        Append every event to a JSON lines file, each tagged with the process id and `fields`.
+        """
+        with open(path, "a", encoding="utf-8") as f:
+            for event in self.events():
+                f.write(json.dumps(dict(event, pid=os.getpid(), **fields), ensure_ascii=False) + "\n")
+
+
+recorder = Recorder()
+span = recorder.span
+count = recorder.count
+
+
+def set_verbose(verbose=True):
+    """
+    Turn progress printing on or off.
+    """
+    global _verbose
+    _verbose = verbose
+
+
+def log(message):
+    """
+    Print a progress message if verbose output is on.
+    """
+    if _verbose:
+        print(message)
+
+
+def log_error(message):
+    """
+    Report an error; always shown, on stderr.
+    """
+    print(message, file=sys.stderr)
+
+
+@contextlib.contextmanager
+def profile(mode, output):
+    """
+    Capture a profile of the enclosed block.
+    :param mode: "cprofile" writes pstats data to `output`; "tracemalloc" writes the
+                 top allocation sites and the peak traced memory to `output` as text.
+    :param output: Path of the profile file.
+    """
+    if mode == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(output)
+    elif mode == "tracemalloc":
+        import tracemalloc
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(output, "w", encoding="utf-8") as f:
+                f.write(f"Peak traced memory: {peak / 1024:.1f} KiB\n")
+                for stat in snapshot.statistics("lineno")[:50]:
+                    f.write(f"{stat}\n")
+    else:
+        raise ValueError(f"Unknown profile mode: {mode}")
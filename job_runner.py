@@ -0,0 +1,329 @@
+import os
+import sys
+import json
+import time
+import inspect
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import instrumentation
+from instrumentation import span, count, log
+from batch_render import DocumentTemplate
+from render_cache import RenderCache, render_key
+from media_optimizer import optimize_media
+from docx_utils import (
+    TextReplacer,
+    populate_table_0,
+    populate_table_from_csv,
+    add_row_to_table,
+    add_rows,
+    delete_rows,
+    is_empty_row,
+    insert_signature,
+)
+
+# Templates parsed so far in this process, keyed by path
+_templates = {}
+
+
+def _op_populate_table_0(doc, template, table_index=0, data=None):
+    # template is None when an earlier operation changed this table; the precompiled
+    # positions would then be stale, so let populate_table_0 match labels afresh
+    label_index = template.label_index(data, table_index) if template and data is not None else None
+    populate_table_0(doc.tables[table_index], data, label_index)
+
+
+def _op_populate_table_from_csv(doc, template, csv, table_index=1, stream=False):
+    populate_table_from_csv(doc, csv, table_index, stream=stream)
+
+
+def _op_add_row(doc, template, table_index, row_data):
+    add_row_to_table(doc, table_index, row_data)
+
+
+def _op_add_rows(doc, template, table_index, rows, template_row_index=-1):
+    add_rows(doc, table_index, rows, template_row_index)
+
+
+def _op_delete_row(doc, template, table_index, row_number):
+    if not delete_rows(doc, table_index, [row_number]):
+        raise IndexError(f"Row {row_number} is out of range for table {table_index}")
+
+
+def _op_delete_rows(doc, template, table_index, row_numbers=(), empty=False):
+    delete_rows(doc, table_index, row_numbers, is_empty_row if empty else None)
+
+
+def _op_add_signature(doc, template, table_index, row, column, image, dpi=96):
+    insert_signature(doc.tables[table_index].rows[row].cells[column], image, dpi)
+
+
+def _op_replace_text(doc, template, replacements):
+    TextReplacer(replacements).replace_in_tree(doc.element)
+
+
+# Operation name -> callable(doc, template, **params); template is None once an earlier
+# operation of the job has changed the table the operation works on
+OPERATIONS = {
+    "populate_table_0": _op_populate_table_0,
+    "populate_table_from_csv": _op_populate_table_from_csv,
+    "add_row": _op_add_row,
+    "add_rows": _op_add_rows,
+    "delete_row": _op_delete_row,
+    "delete_rows": _op_delete_rows,
+    "add_signature": _op_add_signature,
+    "replace_text": _op_replace_text,
+}
+
+
+def read_jobs(jobs_file):
+    """
+    Read jobs from a JSONL file, one JSON object per line. Each job has:
+    "template" (.docx path), "operations" (list of {"op": name, ...params}),
+    "output" (.docx path), and optionally "id", "pdf" (.pdf path) and "optimize_media"
+    (true, or a dict of optimize_media() options such as {"dpi": 150}).
+    :param jobs_file: Path of the JSONL file, or '-' for stdin.
+    """
+    f = sys.stdin if jobs_file == "-" else open(jobs_file, encoding='utf-8')
+    try:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if line:
+                job = json.loads(line)
+                job.setdefault("id", f"line-{line_number}")
+                yield job
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def run_job(job):
+    """
+    Apply one job's operations to a clone of its template and save the output.
+    :return: Result dict with the job id, status, output, error, timings, and the
+             job's stage totals and counters.
+    """
+    start = time.perf_counter()
+    result = {"id": job["id"], "status": "ok", "output": job.get("output"), "error": None}
+    try:
+        template = _templates.get(job["template"])
+        if template is None:
+            template = _templates[job["template"]] = DocumentTemplate(job["template"])
+        with span("clone"):
+            doc = template.new_document()
+
+        changed = set()  # Tables changed by earlier operations; None stands for all of them
+        for operation in job.get("operations", []):
+            params = dict(operation)
+            name = params.pop("op")
+            if name not in OPERATIONS:
+                raise ValueError(f"Unknown operation: {name}")
+            table_index = _target_table(name, params)
+            pristine = None not in changed and table_index not in changed
+            with span(name):
+                OPERATIONS[name](doc, template if pristine else None, **params)
+            changed.add(table_index)
+
+        output_dir = os.path.dirname(job["output"])
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with span("save"):
+            doc.save(job["output"])
+        count("bytes_written", os.path.getsize(job["output"]))
+
+        options = job.get("optimize_media")
+        if options:
+            with span("optimize_media"):
+                optimize_media(job["output"], job["output"], **(options if isinstance(options, dict) else {}))
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 6)
+    result.update(instrumentation.recorder.drain())
+    return result
+
+
+def _target_table(name, params):
+    """
+    Return the index of the table an operation works on, or None if it may change any table.
+    """
+    parameter = inspect.signature(OPERATIONS[name]).parameters.get("table_index")
+    if parameter is None:
+        return None
+    return params.get("table_index", parameter.default)
+
+
+def _init_worker():
+    """
+    Process pool initializer: forget counters inherited from the parent on fork.
+    """
+    instrumentation.recorder.reset()
+
+
+def _run_chunk(jobs):
+    """
+    Run a list of jobs sharing one template in a worker process.
+    """
+    return [run_job(job) for job in jobs]
+
+
+def _chunk_by_template(jobs, chunksize):
+    """
+    Group jobs by template, then split each group into chunks of at most `chunksize`,
+    so every worker task reuses one parsed template.
+    """
+    groups = OrderedDict()
+    for job in jobs:
+        groups.setdefault(job["template"], []).append(job)
+    for group in groups.values():
+        for index in range(0, len(group), chunksize):
+            yield group[index:index + chunksize]
+
+
+def run_jobs(jobs, max_workers=None, chunksize=32, pdf_backend=None, pdf_workers=2, report=None,
+             cache=None):
+    """
+    Run jobs concurrently, parsing each template once per worker process.
+    :param jobs: Iterable of job dicts (see read_jobs).
+    :param max_workers: Number of worker processes; 0 runs the jobs in the current process.
+    :param chunksize: Maximum number of same-template jobs sent to a worker at a time.
+    :param pdf_backend: PdfBackend factory for jobs with a "pdf" output; defaults to the platform's.
+    :param pdf_workers: Number of warm PDF converters.
+    :param report: Writable text file receiving one JSON result line per job as it finishes.
+    :param cache: Optional RenderCache; jobs whose template, operations and input files
+                  are unchanged are copied from it instead of being rendered or converted.
+    :return: List of result dicts.
+    """
+    jobs = list(jobs)
+    pdf_targets = {job["id"]: job["pdf"] for job in jobs if job.get("pdf")}
+    results = []
+    # Jobs run in this process drain the recorder for their own result, so the run's
+    # totals are kept apart and merged back once rendering is done
+    totals = instrumentation.Recorder()
+
+    def record(result):
+        results.append(result)
+        totals.merge(result)
+        if report is not None and result["id"] not in pdf_targets:
+            report.write(json.dumps(result, ensure_ascii=False) + "\n")
+            report.flush()
+
+    start = time.perf_counter()
+    cache_keys = {}
+    to_render = []
+    for job in jobs:
+        if cache is not None:
+            try:
+                # The media options change the output, so they take the record's place in the key
+                cache_keys[job["id"]] = render_key(job["template"], job.get("optimize_media"),
+                                                   job.get("operations"))
+            except OSError:
+                pass  # A missing input file; let the job itself report the error
+            key = cache_keys.get(job["id"])
+            if key is not None and cache.fetch(key, ".docx", job["output"]):
+                record({"id": job["id"], "status": "ok", "output": job["output"], "error": None,
+                        "seconds": 0.0, "cached": True, "stages": {}, "counters": {}})
+                continue
+        to_render.append(job)
+
+    chunks = _chunk_by_template(to_render, chunksize)
+    totals.merge(instrumentation.recorder.drain())  # e.g. cache lookups so far
+    if max_workers == 0:
+        for chunk in chunks:
+            for result in _run_chunk(chunk):
+                record(result)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+            futures = [executor.submit(_run_chunk, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                for result in future.result():
+                    record(result)
+
+    instrumentation.recorder.merge(totals.summary())
+
+    if cache is not None:
+        for result in results:
+            key = cache_keys.get(result["id"])
+            if key is not None and result["status"] == "ok" and not result.get("cached"):
+                cache.store(key, ".docx", result["output"])
+
+    pdf_jobs = [result for result in results if result["id"] in pdf_targets]
+    pdf_suffix = None
+    if pdf_jobs and cache is not None:
+        # PDFs differ between backends, so each backend gets its own cache entries
+        from pdf_converter import default_backend
+        backend = pdf_backend or default_backend()
+        pdf_suffix = f".{getattr(backend, '__qualname__', type(backend).__name__)}.pdf"
+    to_convert = []
+    for result in pdf_jobs:
+        if result["status"] != "ok":
+            continue
+        result["pdf"] = pdf_targets[result["id"]]
+        key = cache_keys.get(result["id"])
+        if key is not None and cache.fetch(key, pdf_suffix, result["pdf"]):
+            result["pdf_seconds"] = 0.0
+            result["pdf_cached"] = True
+        else:
+            to_convert.append(result)
+
+    if to_convert:
+        from pdf_converter import PdfConverterPool
+        with PdfConverterPool(pdf_backend, workers=pdf_workers) as pool:
+            futures = [
+                (result, time.perf_counter(), pool.submit(result["output"], result["pdf"]))
+                for result in to_convert
+            ]
+            for result, submitted, future in futures:
+                error = future.exception()
+                result["pdf_seconds"] = round(time.perf_counter() - submitted, 6)
+                key = cache_keys.get(result["id"])
+                if error is not None:
+                    result["status"] = "error"
+                    result["error"] = f"PDF conversion failed: {type(error).__name__}: {error}"
+                elif key is not None:
+                    cache.store(key, pdf_suffix, result["pdf"])
+    if pdf_jobs and report is not None:
+        for result in pdf_jobs:
+            report.write(json.dumps(result, ensure_ascii=False) + "\n")
+        report.flush()
+
+    failed = sum(1 for result in results if result["status"] != "ok")
+    log(f"Ran {len(results)} jobs ({failed} failed) in {time.perf_counter() - start:.2f}s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply JSONL batches of operations to .docx templates.")
+    parser.add_argument("jobs", help="JSONL file with one job per line ('-' for stdin)")
+    parser.add_argument("--report", help="JSONL file for per-job results (default: stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (0 = in-process)")
+    parser.add_argument("--chunksize", type=int, default=32, help="Same-template jobs per worker task")
+    parser.add_argument("--pdf-backend", default=None, help="PDF backend: word, libreoffice or fake")
+    parser.add_argument("--pdf-workers", type=int, default=2, help="Warm PDF converters")
+    parser.add_argument("--cache-dir", help="Reuse unchanged outputs from this render cache")
+    parser.add_argument("--cache-max-mb", type=int, default=2048, help="Render cache size limit in MiB")
+    parser.add_argument("--verbose", action="store_true", help="Print progress messages")
+    parser.add_argument("--metrics", help="Append stage totals and counters to this JSONL file")
+    args = parser.parse_args()
+
+    instrumentation.set_verbose(args.verbose)
+
+    backend = None
+    if args.pdf_backend:
+        from pdf_converter import BACKENDS
+        backend = BACKENDS[args.pdf_backend]
+
+    render_cache = RenderCache(args.cache_dir, args.cache_max_mb * 1024 ** 2) if args.cache_dir else None
+    report_file = open(args.report, "w", encoding="utf-8") if args.report else sys.stdout
+    try:
+        job_results = run_jobs(read_jobs(args.jobs), max_workers=args.workers, chunksize=args.chunksize,
+                               pdf_backend=backend, pdf_workers=args.pdf_workers, report=report_file,
+                               cache=render_cache)
+    finally:
+        if report_file is not sys.stdout:
+            report_file.close()
+    failed = sum(1 for result in job_results if result["status"] != "ok")
+    print(f"Ran {len(job_results)} jobs ({failed} failed)", file=sys.stderr)
+    if args.metrics:
+        instrumentation.recorder.export_jsonl(args.metrics, command="job_runner")
+    sys.exit(1 if failed else 0)
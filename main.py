@@ -1,5 +1,9 @@
 import os
+from docx import Document
 from docx_utils import *
+from instrumentation import set_verbose
+
+set_verbose(True)  # Interactive use: show progress messages
 
 # File paths
 INPUT_DOCX = "input.docx"  # Replace with your actual .docx file path
@@ -0,0 +1,176 @@
+import io
+import os
+import math
+import time
+import shutil
+import zipfile
+import argparse
+import posixpath
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import span, count, log, log_error
+from docx_utils import rewrite_docx
+
+EMU_PER_INCH = 914400
+WP_NAMESPACE = 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing'
+A_NAMESPACE = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+R_NAMESPACE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+REL_NAMESPACE = 'http://schemas.openxmlformats.org/package/2006/relationships'
+IMAGE_REL_TYPE = R_NAMESPACE + '/image'
+
+# Media formats that are recompressed, by file extension
+FORMATS = {'.png': 'PNG', '.jpg': 'JPEG', '.jpeg': 'JPEG'}
+
+# Smallest relative saving for which an image is replaced; avoids re-encoding already
+# optimised JPEGs again and again for a few bytes of generation loss
+MIN_SAVING = 0.05
+
+
+def optimize_media(input_docx, output_docx, dpi=150, jpeg_quality=85, max_workers=None):
+    """
+    Shrink the PNG/JPEG images in a .docx: each is downscaled to the largest size it is
+    displayed at (from its drawings' extents) at `dpi`, then recompressed in a thread
+    pool. Optimised bytes replace the original media part only when at least MIN_SAVING
+    smaller; images that are cropped or referenced other than by a DrawingML picture
+    are only recompressed, never downscaled.
+    :param input_docx: Path of the source .docx.
+    :param output_docx: Path of the optimised .docx; may be the same as `input_docx`.
+    :param dpi: Resolution kept at the displayed size.
+    :param jpeg_quality: JPEG quality (1-95) used when recompressing JPEGs.
+    :param max_workers: Number of worker threads; defaults to the executor's default.
+    :return: Number of bytes saved across the media parts.
+    """
+    start = time.perf_counter()
+    with zipfile.ZipFile(input_docx) as zin:
+        sizes = _displayed_sizes(zin)
+        media = {name: zin.read(name) for name in zin.namelist()
+                 if name.startswith('word/media/') and posixpath.splitext(name)[1].lower() in FORMATS}
+
+    jobs = [(name, data, sizes.get(name), dpi, jpeg_quality) for name, data in media.items()]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        optimized = dict(zip(media, executor.map(_optimize_image, jobs)))
+
+    transforms = {}
+    saved = 0
+    for name, data in optimized.items():
+        if data is not None and len(data) <= len(media[name]) * (1 - MIN_SAVING):
+            saved += len(media[name]) - len(data)
+            transforms[name] = lambda _, data=data: data
+    count("images_optimized", len(transforms))
+    count("media_bytes_saved", saved)
+
+    if os.path.abspath(input_docx) == os.path.abspath(output_docx):
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_docx)), suffix='.docx')
+        os.close(fd)
+        try:
+            rewrite_docx(input_docx, temporary, transforms)
+            shutil.copymode(input_docx, temporary)  # mkstemp creates the file owner-only
+            os.replace(temporary, output_docx)
+        except BaseException:
+            os.remove(temporary)
+            raise
+    else:
+        rewrite_docx(input_docx, output_docx, transforms)
+    log(f"Optimised {len(transforms)} of {len(media)} images in {input_docx}, "
+        f"saving {saved} bytes in {time.perf_counter() - start:.2f}s")
+    return saved
+
+
+def _displayed_sizes(zin):
+    """
+    Map each image part to the largest (cx, cy) extent in EMU it is displayed at,
+    across every part that references it. Images that are cropped or referenced by
+    anything other than a DrawingML picture (e.g. VML) map to None.
+    """
+    from lxml import etree
+    sizes = {}
+    names = set(zin.namelist())
+    for rels_name in names:
+        directory, rels_file = posixpath.split(rels_name)
+        if posixpath.basename(directory) != '_rels' or not rels_file.endswith('.rels'):
+            continue
+        part_dir = posixpath.dirname(directory)
+        part_name = posixpath.join(part_dir, rels_file[:-len('.rels')])
+        if part_name not in names or not part_name.endswith('.xml'):
+            continue
+
+        images = {}  # rId -> image part name
+        for rel in etree.fromstring(zin.read(rels_name)).iterfind(f'{{{REL_NAMESPACE}}}Relationship'):
+            if rel.get('Type') == IMAGE_REL_TYPE and rel.get('TargetMode') != 'External':
+                images[rel.get('Id')] = posixpath.normpath(posixpath.join(part_dir, rel.get('Target')))
+        if not images:
+            continue
+
+        root = etree.fromstring(zin.read(part_name))
+        measured = {}  # rId -> number of references with known extents
+        for kind in ('inline', 'anchor'):
+            for drawing in root.iter(f'{{{WP_NAMESPACE}}}{kind}'):
+                extent = drawing.find(f'{{{WP_NAMESPACE}}}extent')
+                for blip in drawing.iter(f'{{{A_NAMESPACE}}}blip'):
+                    rId = blip.get(f'{{{R_NAMESPACE}}}embed')
+                    if rId not in images:
+                        continue
+                    image = images[rId]
+                    cropped = blip.getparent().find(f'{{{A_NAMESPACE}}}srcRect') is not None
+                    if extent is None or cropped or (image in sizes and sizes[image] is None):
+                        sizes[image] = None
+                        continue
+                    cx, cy = int(extent.get('cx')), int(extent.get('cy'))
+                    previous = sizes.get(image, (0, 0))
+                    sizes[image] = (max(previous[0], cx), max(previous[1], cy))
+                    measured[rId] = measured.get(rId, 0) + 1
+
+        # Any other reference (VML image data, links) has no known size
+        references = {}
+        for element in root.iter():
+            for attribute, value in element.attrib.items():
+                if attribute.startswith(f'{{{R_NAMESPACE}}}') and value in images:
+                    references[value] = references.get(value, 0) + 1
+        for rId, total in references.items():
+            if measured.get(rId, 0) != total:
+                sizes[images[rId]] = None
+    return sizes
+
+
+def _optimize_image(job):
+    """
+    Downscale and recompress one image; runs in a worker thread.
+    :param job: (part name, image bytes, displayed (cx, cy) in EMU or None, dpi, jpeg_quality).
+    :return: The optimised image bytes, or None if the image could not be processed.
+    """
+    from PIL import Image
+    name, data, extent, dpi, jpeg_quality = job
+    image_format = FORMATS[posixpath.splitext(name)[1].lower()]
+    try:
+        with span("image_optimize", part=name), Image.open(io.BytesIO(data)) as img:
+            img.load()
+            if extent is not None:
+                width = math.ceil(extent[0] / EMU_PER_INCH * dpi)
+                height = math.ceil(extent[1] / EMU_PER_INCH * dpi)
+                if 0 < width < img.width and 0 < height < img.height:
+                    img = img.resize((width, height), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            if image_format == 'JPEG':
+                if img.mode not in ('RGB', 'L', 'CMYK'):
+                    img = img.convert('RGB')
+                img.save(buffer, format='JPEG', quality=jpeg_quality, optimize=True)
+            else:
+                img.save(buffer, format='PNG', optimize=True)
+            return buffer.getvalue()
+    except Exception as e:
+        log_error(f"Error optimising image {name}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Downscale and recompress the images embedded in .docx files.")
+    parser.add_argument("inputs", nargs="+", help=".docx files to optimise in place")
+    parser.add_argument("--dpi", type=int, default=150, help="Resolution kept at the displayed size")
+    parser.add_argument("--jpeg-quality", type=int, default=85, help="JPEG quality (1-95)")
+    parser.add_argument("--workers", type=int, default=None, help="Image worker threads")
+    args = parser.parse_args()
+
+    total = 0
+    for path in args.inputs:
+        total += optimize_media(path, path, args.dpi, args.jpeg_quality, args.workers)
+    print(f"Saved {total} bytes across {len(args.inputs)} files")
@@ -0,0 +1,300 @@
+import os
+import sys
+import time
+import queue
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import Future
+from instrumentation import span, count, log_error
+
+WD_FORMAT_PDF = 17  # Word's constant for wdFormatPDF
+
+
+class PdfBackend:
+    """
+    Interface for a PDF converter owned by one pool worker.
+    start() is called once before the first job, convert() once per job, and close()
+    when the worker is recycled or the pool shuts down.
+    """
+
+    def start(self):
+        pass
+
+    def convert(self, input_docx, output_pdf):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class WordBackend(PdfBackend):
+    """
+    Converts through a private Microsoft Word instance driven over COM (Windows only).
+    """
+
+    def start(self):
+        import pythoncom
+        import win32com.client
+        pythoncom.CoInitialize()  # COM must be initialised on each worker thread
+        self._word = win32com.client.DispatchEx("Word.Application")
+        self._word.Visible = False
+        self._word.DisplayAlerts = 0
+
+    def convert(self, input_docx, output_pdf):
+        doc = self._word.Documents.Open(os.path.abspath(input_docx), ReadOnly=True)
+        try:
+            doc.SaveAs(os.path.abspath(output_pdf), FileFormat=WD_FORMAT_PDF)
+        finally:
+            doc.Close(False)
+
+    def close(self):
+        import pythoncom
+        try:
+            self._word.Quit()
+        except Exception as e:
+            log_error(f"Error closing Word: {e}")
+        pythoncom.CoUninitialize()
+
+
+class LibreOfficeBackend(PdfBackend):
+    """
+    Converts through a headless soffice process that stays up between jobs and is
+    driven over UNO. Each backend uses its own user profile and port, so several can
+    run side by side.
+    """
+
+    def __init__(self, soffice="soffice", startup_timeout=30):
+        """
+        :param soffice: soffice executable name or path.
+        :param startup_timeout: Seconds to wait for soffice to accept connections.
+        """
+        self.soffice = soffice
+        self.startup_timeout = startup_timeout
+
+    def start(self):
+        import uno
+        self._profile = tempfile.mkdtemp(prefix="docx_soffice_")
+        port = _free_port()
+        connection = f"socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"
+        self._process = subprocess.Popen(
+            [self.soffice, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault",
+             f"-env:UserInstallation={Path(self._profile).as_uri()}", f"--accept={connection}"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            try:
+                context = resolver.resolve(f"uno:{connection}")
+                break
+            except Exception:
+                if self._process.poll() is not None or time.monotonic() > deadline:
+                    self.close()
+                    raise RuntimeError("soffice did not start accepting connections")
+                time.sleep(0.25)
+        self._desktop = context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.frame.Desktop", context)
+
+    def convert(self, input_docx, output_pdf):
+        import uno
+        doc = self._desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(input_docx)), "_blank", 0,
+            (_property_value("Hidden", True),))
+        try:
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(output_pdf)),
+                           (_property_value("FilterName", "writer_pdf_Export"),))
+        finally:
+            doc.close(True)
+
+    def close(self):
+        try:
+            self._desktop.terminate()
+        except Exception:
+            pass
+        process = getattr(self, "_process", None)
+        if process is not None:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(self._profile, ignore_errors=True)
+
+
+class FakeBackend(PdfBackend):
+    """
+    Writes a placeholder PDF without any office suite; for tests and dry runs.
+    """
+
+    def __init__(self, delay=0.0, fail_on=()):
+        """
+        :param delay: Seconds each conversion takes.
+        :param fail_on: Input file names whose conversion raises an error.
+        """
+        self.delay = delay
+        self.fail_on = set(fail_on)
+        self.converted = []
+
+    def convert(self, input_docx, output_pdf):
+        time.sleep(self.delay)
+        if os.path.basename(input_docx) in self.fail_on:
+            raise RuntimeError(f"Fake conversion failure: {input_docx}")
+        with open(output_pdf, "wb") as f:
+            f.write(b"%PDF-1.4\n% fake conversion of " + os.fsencode(os.path.basename(input_docx)) + b"\n%%EOF\n")
+        self.converted.append(input_docx)
+
+
+BACKENDS = {
+    "word": WordBackend,
+    "libreoffice": LibreOfficeBackend,
+    "fake": FakeBackend,
+}
+
+
+def default_backend():
+    """
+    Return the backend class for this platform: Word on Windows, LibreOffice elsewhere.
+    """
+    return WordBackend if sys.platform == "win32" else LibreOfficeBackend
+
+
+class PdfConverterPool:
+    """
+    A pool of warm converter workers fed from a job queue.
+
+    Each worker thread owns one backend instance, started on its first job and kept
+    alive across jobs. A worker recycles its backend after `max_jobs_per_worker`
+    conversions, or immediately when a conversion fails.
+    """
+
+    def __init__(self, backend_factory=None, workers=2, max_jobs_per_worker=200):
+        """
+        :param backend_factory: Callable returning a new PdfBackend; defaults to default_backend().
+        :param workers: Number of converter workers kept alive.
+        :param max_jobs_per_worker: Conversions after which a worker restarts its backend.
+        """
+        self.backend_factory = backend_factory or default_backend()
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._jobs = queue.Queue()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"pdf-worker-{index}", daemon=True)
+            for index in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, input_docx, output_pdf):
+        """
+        Queue a conversion.
+        :return: A Future resolving to `output_pdf`.
+        """
+        future = Future()
+        self._jobs.put((input_docx, output_pdf, future))
+        return future
+
+    def convert_many(self, jobs):
+        """
+        Convert (input_docx, output_pdf) pairs and wait for all of them.
+        :return: List of (output_pdf, error) tuples in job order; error is None on success.
+        """
+        futures = [(output_pdf, self.submit(input_docx, output_pdf)) for input_docx, output_pdf in jobs]
+        return [(output_pdf, future.exception()) for output_pdf, future in futures]
+
+    def close(self):
+        """
+        Finish queued jobs, then stop all workers and their backends.
+        """
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _work(self):
+        backend = None
+        jobs_done = 0
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            input_docx, output_pdf, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if backend is None:
+                    backend = self.backend_factory()
+                    backend.start()
+                    jobs_done = 0
+                with span("pdf_convert", backend=type(backend).__name__):
+                    backend.convert(input_docx, output_pdf)
+                count("pdfs_converted")
+                future.set_result(output_pdf)
+                jobs_done += 1
+            except Exception as e:
+                log_error(f"Error during PDF conversion of {input_docx}: {e}")
+                future.set_exception(e)
+                backend = _close_backend(backend)
+                continue
+            if jobs_done >= self.max_jobs_per_worker:
+                backend = _close_backend(backend)
+        _close_backend(backend)
+
+
+def _close_backend(backend):
+    """
+    Close a backend, logging rather than raising on failure.
+    :return: None, for resetting the caller's reference.
+    """
+    if backend is not None:
+        try:
+            backend.close()
+        except Exception as e:
+            log_error(f"Error closing PDF backend: {e}")
+    return None
+
+
+def _free_port():
+    """
+    Return a TCP port on localhost that is currently free.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _property_value(name, value):
+    """
+    Build a UNO PropertyValue.
+    """
+    from com.sun.star.beans import PropertyValue
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert .docx files to PDF with a pool of warm converters.")
+    parser.add_argument("inputs", nargs="+", help=".docx files to convert")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=None, help="Converter backend")
+    parser.add_argument("--workers", type=int, default=2, help="Converter workers kept alive")
+    parser.add_argument("--max-jobs", type=int, default=200, help="Jobs before a worker is recycled")
+    args = parser.parse_args()
+
+    backend = BACKENDS[args.backend] if args.backend else None
+    start = time.perf_counter()
+    with PdfConverterPool(backend, workers=args.workers, max_jobs_per_worker=args.max_jobs) as pool:
+        results = pool.convert_many((path, os.path.splitext(path)[0] + ".pdf") for path in args.inputs)
+    failed = sum(1 for _, error in results if error is not None)
+    print(f"Converted {len(results) - failed}/{len(results)} files in {time.perf_counter() - start:.2f}s")
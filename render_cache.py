@@ -0,0 +1,124 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from instrumentation import count, log
+from docx_utils import file_sha256
+
+
+class RenderCache:
+    """
+    A content-addressed, size-bounded store of rendered outputs.
+
+    Entries are files named <key><suffix> (e.g. "<key>.docx", "<key>.pdf") in one
+    directory. A hit refreshes the entry's modification time, and when the directory
+    grows past `max_bytes` the least recently used entries are deleted.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        """
+        :param cache_dir: Directory holding the cached files; created if missing.
+        :param max_bytes: Size limit for the whole cache.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.is_file())
+
+    def path(self, key, suffix):
+        """
+        Return the file path of the entry for `key` and `suffix`.
+        """
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def fetch(self, key, suffix, destination):
+        """
+        Copy the cached entry to `destination` if there is one.
+        :return: True on a cache hit.
+        """
+        cached = self.path(key, suffix)
+        try:
+            os.utime(cached)  # Mark as recently used
+        except FileNotFoundError:
+            count("cache_misses")
+            return False
+        destination_dir = os.path.dirname(destination)
+        if destination_dir:
+            os.makedirs(destination_dir, exist_ok=True)
+        shutil.copyfile(cached, destination)
+        count("cache_hits")
+        return True
+
+    def store(self, key, suffix, source):
+        """
+        Add a copy of `source` to the cache under `key`, then evict if over the size limit.
+        """
+        cached = self.path(key, suffix)
+        fd, temporary = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(source, temporary)
+        previous = os.path.getsize(cached) if os.path.exists(cached) else 0
+        os.replace(temporary, cached)  # Atomic, so concurrent readers never see partial files
+        self._size += os.path.getsize(cached) - previous
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """
+        Delete least recently used entries until the cache is back under 90% of its limit.
+        """
+        entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                         for entry in os.scandir(self.cache_dir)
+                         if entry.is_file() and not entry.name.endswith(".tmp"))
+        self._size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            count("cache_evictions")
+        log(f"Render cache trimmed to {self._size} bytes")
+
+
+def render_key(template_path, record=None, operations=None, file_params=("csv", "image")):
+    """
+    Return the cache key of a render: a hash of the template bytes, the record and the
+    operation list. Operation parameters named in `file_params` are paths whose file
+    contents are hashed instead, so editing a CSV or signature image changes the key.
+    """
+    sha = hashlib.sha256()
+    sha.update(_hashed_file(template_path).encode())
+    sha.update(_canonical_json(record).encode())
+    operations = [
+        {name: _hashed_file(value) if name in file_params else value for name, value in operation.items()}
+        for operation in operations or ()
+    ]
+    sha.update(_canonical_json(operations).encode())
+    return sha.hexdigest()
+
+
+_file_hashes = {}
+
+
+def _hashed_file(path):
+    """
+    Return the content hash of a file, memoised per (path, size, mtime).
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _file_hashes.get(memo_key)
+    if digest is None:
+        digest = _file_hashes[memo_key] = file_sha256(path)
+    return digest
+
+
+def _canonical_json(value):
+    """
+    Serialise `value` the same way regardless of dict ordering.
+    """
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)